@@ -2,6 +2,11 @@ from flask import Flask, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import os
+import time
+import math
+import threading
+import click
+from functools import wraps
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -15,6 +20,53 @@ CORS(app)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+# Connections are opened lazily on first use; pre-ping drops stale ones
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+
+# Startup behaviour: schema creation and seeding only run on `python app.py`
+# when enabled (on by default outside production); use `flask init-db` /
+# `flask seed` otherwise
+app.config['AUTO_INIT_DB'] = os.getenv(
+    'AUTO_INIT_DB',
+    'false' if os.getenv('FLASK_ENV') == 'production' else 'true'
+).lower() == 'true'
+app.config['WARMUP_ON_STARTUP'] = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+# The cache is per worker process: writes only clear the handling worker's
+# copy, so other workers may serve stale results for up to this long
+app.config['CACHE_TTL_SECONDS'] = int(os.getenv('CACHE_TTL_SECONDS', '5'))
+
+def parse_rate_limit(name, default):
+    """Read a "<tokens per second>:<burst>" setting as (rate, burst)"""
+    value = os.getenv(name, default)
+    try:
+        rate, burst = value.split(':')
+        rate, burst = float(rate), int(burst)
+    except ValueError:
+        raise ValueError(f"{name} must look like '<rate>:<burst>', got {value!r}")
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"{name} needs rate > 0 and burst >= 1, got {value!r}")
+    return rate, burst
+
+# Load protection: token-bucket rate limits (per client and per route),
+# concurrency caps on expensive routes and a timeout on read queries.
+# Buckets are in memory per worker by default, so a client can get up to
+# GUNICORN_WORKERS times these limits; set RATE_LIMIT_STORAGE_URL=redis://...
+# to share buckets between workers and instances
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+app.config['RATE_LIMIT_STORAGE_URL'] = os.getenv('RATE_LIMIT_STORAGE_URL')
+app.config['RATE_LIMIT_RATE'] = float(os.getenv('RATE_LIMIT_RATE', '10'))
+app.config['RATE_LIMIT_BURST'] = int(os.getenv('RATE_LIMIT_BURST', '20'))
+# Per-route limits as "<tokens per second>:<burst>"
+app.config['PRODUCTS_RATE_LIMIT'] = parse_rate_limit('PRODUCTS_RATE_LIMIT', '2:10')
+app.config['STATS_RATE_LIMIT'] = parse_rate_limit('STATS_RATE_LIMIT', '0.5:5')
+# Expensive routes share one pool of slots per worker, kept below the
+# gunicorn thread count so cheap lookups always find a free thread
+app.config['GUNICORN_THREADS'] = int(os.getenv('GUNICORN_THREADS', '4'))
+app.config['EXPENSIVE_ROUTE_CONCURRENCY'] = int(os.getenv(
+    'EXPENSIVE_ROUTE_CONCURRENCY',
+    str(max(1, app.config['GUNICORN_THREADS'] - 1))
+))
+app.config['STATEMENT_TIMEOUT_MS'] = int(os.getenv('STATEMENT_TIMEOUT_MS', '3000'))
 
 db = SQLAlchemy(app)
 
@@ -41,6 +93,259 @@ class Product(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Simple in-process cache for expensive aggregate queries
+_cache = {}
+_cache_lock = threading.Lock()
+
+def cache_get(key):
+    """Return a cached value if it has not expired, otherwise None"""
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+def cache_set(key, value):
+    """Store a value in the cache for CACHE_TTL_SECONDS"""
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + app.config['CACHE_TTL_SECONDS'], value)
+
+def cache_clear():
+    """Drop all cached values (called after any product write)"""
+    with _cache_lock:
+        _cache.clear()
+
+def load_categories():
+    """Get sorted unique categories, using the cache when warm"""
+    category_list = cache_get('categories')
+    if category_list is None:
+        set_read_timeout()
+        categories = db.session.query(Product.category).distinct().all()
+        category_list = sorted(cat[0] for cat in categories if cat[0])
+        cache_set('categories', category_list)
+    return category_list
+
+def load_stats():
+    """Get catalog statistics, using the cache when warm"""
+    stats = cache_get('stats')
+    if stats is None:
+        set_read_timeout()
+        total_products = Product.query.count()
+        total_categories = db.session.query(Product.category).distinct().count()
+        total_stock = db.session.query(db.func.sum(Product.stock_quantity)).scalar() or 0
+        avg_price = db.session.query(db.func.avg(Product.price)).scalar() or 0
+
+        # Products by category
+        category_stats = db.session.query(
+            Product.category,
+            db.func.count(Product.id).label('count')
+        ).group_by(Product.category).all()
+
+        stats = {
+            "total_products": total_products,
+            "total_categories": total_categories,
+            "total_stock": int(total_stock),
+            "average_price": round(float(avg_price), 2),
+            "category_breakdown": {cat: count for cat, count in category_stats}
+        }
+        cache_set('stats', stats)
+    return stats
+
+# Token bucket storage backends
+class MemoryBucketStore:
+    """In-process token buckets; each worker enforces its limits separately"""
+
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token; return 0 if allowed, else seconds until the next token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Buckets idle for a minute have refilled and can be forgotten
+        stale = [k for k, (_, last) in self._buckets.items() if now - last > 60]
+        for k in stale:
+            del self._buckets[k]
+
+
+class RedisBucketStore:
+    """Token buckets shared between instances through Redis"""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    -- Use the Redis server clock so every instance refills with the same time
+    -- (replicate_commands lets Redis < 5 write after reading TIME)
+    if redis.replicate_commands then redis.replicate_commands() end
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    # Short socket timeouts so an unreachable Redis can't pin workers
+    SOCKET_TIMEOUT = 0.1
+    # After this many consecutive errors, use local buckets for a while
+    MAX_FAILURES = 3
+    RETRY_AFTER_SECONDS = 30
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for a shared store
+        self._client = redis.Redis.from_url(
+            url,
+            socket_connect_timeout=self.SOCKET_TIMEOUT,
+            socket_timeout=self.SOCKET_TIMEOUT
+        )
+        self._take = self._client.register_script(self.SCRIPT)
+        self._fallback = MemoryBucketStore()
+        self._failures = 0
+        self._open_until = 0
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token; return 0 if allowed, else seconds until the next token"""
+        if time.monotonic() < self._open_until:
+            return self._fallback.take(key, rate, burst)
+        try:
+            wait = self._take(keys=[f'ratelimit:{key}'], args=[rate, burst])
+        except Exception as e:
+            self._record_failure(e)
+            return self._fallback.take(key, rate, burst)
+        if self._failures:
+            with self._lock:
+                if self._failures >= self.MAX_FAILURES:
+                    print("✅ Rate limit store reachable again")
+                self._failures = 0
+        return float(wait)
+
+    def _record_failure(self, error):
+        # Open the circuit after repeated errors and log only when it opens
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.MAX_FAILURES:
+                print(f"⚠️ Rate limit store unavailable, using local buckets: {str(error)}")
+            if self._failures >= self.MAX_FAILURES:
+                self._open_until = time.monotonic() + self.RETRY_AFTER_SECONDS
+
+
+def create_bucket_store(url):
+    """Pick the bucket store from RATE_LIMIT_STORAGE_URL"""
+    if url and url.startswith(('redis://', 'rediss://')):
+        return RedisBucketStore(url)
+    return MemoryBucketStore()
+
+bucket_store = create_bucket_store(app.config['RATE_LIMIT_STORAGE_URL'])
+
+def client_id():
+    """Identify the caller (nginx passes the real address in X-Real-IP)"""
+    return request.headers.get('X-Real-IP') or request.remote_addr or 'unknown'
+
+def too_many_requests(wait):
+    """429 response telling the client when to retry"""
+    response = jsonify({
+        "success": False,
+        "error": "Too many requests",
+        "message": "Rate limit exceeded, please retry later"
+    })
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response, 429
+
+def check_rate_limit(key, rate, burst):
+    """Return a 429 response if the bucket for key is empty, else None"""
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return None
+    try:
+        wait = bucket_store.take(key, rate, burst)
+    except Exception as e:
+        # Fail open: an unavailable store must not take the API down
+        print(f"⚠️ Rate limit store error: {str(e)}")
+        return None
+    if wait > 0:
+        return too_many_requests(wait)
+    return None
+
+@app.before_request
+def apply_client_rate_limit():
+    """Default per-client limit applied to every request"""
+    if request.endpoint in (None, 'health_check') or request.method == 'OPTIONS':
+        return None
+    return check_rate_limit(
+        f'client:{client_id()}',
+        app.config['RATE_LIMIT_RATE'],
+        app.config['RATE_LIMIT_BURST']
+    )
+
+def rate_limit(config_key):
+    """Per-route, per-client token bucket on top of the default limit
+
+    The limit is read from app.config[config_key] as a (rate, burst) tuple.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            rate, burst = app.config[config_key]
+            limited = check_rate_limit(f'route:{view.__name__}:{client_id()}', rate, burst)
+            if limited:
+                return limited
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Slots shared by every expensive route in this worker
+expensive_route_slots = threading.BoundedSemaphore(app.config['EXPENSIVE_ROUTE_CONCURRENCY'])
+
+def concurrency_limit(view):
+    """Shed load with a 503 when all expensive-route slots are busy"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not expensive_route_slots.acquire(blocking=False):
+            response = jsonify({
+                "success": False,
+                "error": "Service busy",
+                "message": "Too many concurrent requests, please retry later"
+            })
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        try:
+            return view(*args, **kwargs)
+        finally:
+            expensive_route_slots.release()
+    return wrapper
+
+def set_read_timeout():
+    """Bound read queries in the current transaction with a server-side timeout"""
+    timeout_ms = app.config['STATEMENT_TIMEOUT_MS']
+    if timeout_ms > 0 and db.engine.dialect.name == 'postgresql':
+        # SET LOCAL is reset when the request's transaction ends
+        db.session.execute(db.text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -65,10 +370,13 @@ def health_check():
 
 # Get all products
 @app.route('/products', methods=['GET'])
+@rate_limit('PRODUCTS_RATE_LIMIT')
+@concurrency_limit
 def get_products():
     """Get all products with optional filtering"""
     try:
         # Get query parameters for potential filtering
+        set_read_timeout()
         category = request.args.get('category')
         limit = request.args.get('limit', type=int)
         
@@ -106,6 +414,7 @@ def get_products():
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
+        set_read_timeout()
         product = Product.query.get(product_id)
         
         if not product:
@@ -129,9 +438,12 @@ def get_product(product_id):
 
 # Get products by category
 @app.route('/products/category/<category>', methods=['GET'])
+@rate_limit('PRODUCTS_RATE_LIMIT')
+@concurrency_limit
 def get_products_by_category(category):
     """Get products filtered by category"""
     try:
+        set_read_timeout()
         products = Product.query.filter_by(category=category).order_by(Product.created_at.desc()).all()
         products_data = [product.to_dict() for product in products]
         
@@ -216,6 +528,7 @@ def create_product():
         
         db.session.add(product)
         db.session.commit()
+        cache_clear()
         
         print(f"✅ Product created successfully: {product.name} (ID: {product.id})")
         
@@ -293,6 +606,7 @@ def update_product(product_id):
                 }), 400
         
         db.session.commit()
+        cache_clear()
         
         return jsonify({
             "success": True,
@@ -325,6 +639,7 @@ def delete_product(product_id):
         product_name = product.name
         db.session.delete(product)
         db.session.commit()
+        cache_clear()
         
         return jsonify({
             "success": True,
@@ -345,12 +660,11 @@ def delete_product(product_id):
 def get_categories():
     """Get all unique product categories"""
     try:
-        categories = db.session.query(Product.category).distinct().all()
-        category_list = [cat[0] for cat in categories if cat[0]]
+        category_list = load_categories()
         
         return jsonify({
             "success": True,
-            "data": sorted(category_list),
+            "data": category_list,
             "count": len(category_list)
         }), 200
         
@@ -364,31 +678,14 @@ def get_categories():
 
 # Get statistics endpoint (bonus)
 @app.route('/stats', methods=['GET'])
+@rate_limit('STATS_RATE_LIMIT')
+@concurrency_limit
 def get_stats():
     """Get catalog statistics"""
     try:
-        total_products = Product.query.count()
-        total_categories = db.session.query(Product.category).distinct().count()
-        total_stock = db.session.query(db.func.sum(Product.stock_quantity)).scalar() or 0
-        avg_price = db.session.query(db.func.avg(Product.price)).scalar() or 0
-        
-        # Products by category
-        category_stats = db.session.query(
-            Product.category,
-            db.func.count(Product.id).label('count')
-        ).group_by(Product.category).all()
-        
-        category_breakdown = {cat: count for cat, count in category_stats}
-        
         return jsonify({
             "success": True,
-            "data": {
-                "total_products": total_products,
-                "total_categories": total_categories,
-                "total_stock": int(total_stock),
-                "average_price": round(float(avg_price), 2),
-                "category_breakdown": category_breakdown
-            }
+            "data": load_stats()
         }), 200
         
     except Exception as e:
@@ -429,7 +726,8 @@ def bad_request(error):
 def init_sample_data():
     """Initialize database with comprehensive sample products if empty"""
     try:
-        if Product.query.count() == 0:
+        # Only check for a single row instead of counting the whole table
+        if db.session.query(Product.id).first() is None:
             print("🔄 Initializing database with sample data...")
             
             sample_products = [
@@ -584,30 +882,71 @@ def init_sample_data():
                 db.session.add(product)
             
             db.session.commit()
+            cache_clear()
             print(f"✅ {len(sample_products)} sample products initialized successfully!")
             
-    except Exception as e:
-        print(f"❌ Error initializing sample data: {str(e)}")
+    except Exception:
         db.session.rollback()
+        raise
 
-# Application startup
-if __name__ == '__main__':
+# Database management CLI commands
+@app.cli.command('init-db')
+def init_db_command():
+    """Create all database tables"""
+    db.create_all()
+    click.echo("✅ Database tables created successfully!")
+
+@app.cli.command('seed')
+def seed_command():
+    """Insert sample products if the catalog is empty"""
+    try:
+        init_sample_data()
+    except Exception as e:
+        raise click.ClickException(f"Error initializing sample data: {str(e)}")
+
+# Background connection warm-up
+def warm_up():
+    """Open a pooled database connection with a trivial query
+
+    Deliberately avoids the catalog tables so the cost does not grow with
+    catalog size; /categories and /stats are cached on first request.
+    """
     with app.app_context():
         try:
-            # Create all database tables
-            db.create_all()
-            print("✅ Database tables created successfully!")
-            
-            # Initialize with sample data
-            init_sample_data()
-            
-            # Print startup info
-            product_count = Product.query.count()
-            category_count = db.session.query(Product.category).distinct().count()
-            print(f"📊 Database ready: {product_count} products across {category_count} categories")
-            
+            db.session.execute(db.text("SELECT 1"))
+            print("🔥 Database connection warmed up")
         except Exception as e:
-            print(f"❌ Error during database initialization: {str(e)}")
+            print(f"⚠️ Connection warm-up skipped: {str(e)}")
+        finally:
+            db.session.remove()
+
+def start_warm_up():
+    """Run the warm-up in a daemon thread so startup is not blocked
+
+    Called from `python app.py` and from the gunicorn post_worker_init hook
+    (see gunicorn.conf.py), never at import time, so CLI commands don't warm up.
+    """
+    thread = threading.Thread(target=warm_up, name='connection-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+# Application startup
+if __name__ == '__main__':
+    if app.config['AUTO_INIT_DB']:
+        with app.app_context():
+            try:
+                # Create all database tables
+                db.create_all()
+                print("✅ Database tables created successfully!")
+                
+                # Initialize with sample data
+                init_sample_data()
+                
+            except Exception as e:
+                print(f"❌ Error during database initialization: {str(e)}")
+    
+    if app.config['WARMUP_ON_STARTUP']:
+        start_warm_up()
     
     # Run the application
     print("🚀 Starting Catalog Server...")
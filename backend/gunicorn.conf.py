@@ -0,0 +1,13 @@
+# Gunicorn configuration for the catalog server
+import os
+
+workers = int(os.getenv('GUNICORN_WORKERS', '3'))
+# app.py sizes EXPENSIVE_ROUTE_CONCURRENCY from the same variable
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+
+def post_worker_init(worker):
+    """Warm up a database connection once a worker has booted"""
+    from app import app, start_warm_up
+    if app.config['WARMUP_ON_STARTUP']:
+        start_warm_up()